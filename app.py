@@ -5,47 +5,134 @@ import sys
 
 from pathlib import Path
 
-from speech2ipa import analyzers, filters, outputs, utils
+from speech2ipa import analyzers, filters, index, lpc, outputs, pitch, segments, utils, vowels
 
 
 if __name__ == '__main__':
 
-    if len(sys.argv) > 1:
-        infile_str = sys.argv[1]
+    # Separate "--option=value" arguments from positional arguments:
+    #   --query=START,END       print indexed data in time range (e.g. 01:12:03,01:12:09)
+    #   --longer-than=SECONDS   only print query intervals longer than this
+    #   --workers=N             number of threads for the spectrogram
+    #   --formants=peaks|lpc    formant engine (see analyzers.FORMANT_ENGINE)
+    #   --vowels=FILE.csv       extra reference vowel formants (see vowels.load_vowel_table)
+    #   --register=NAME         reference vowel register instead of the one found from F0
+    options = dict(a[2:].split('=', 1) for a in sys.argv[1:] if a.startswith('--') and '=' in a)
+    args = [a for a in sys.argv if not a.startswith('--')]
+
+    if len(args) > 1:
+        infile_str = args[1]
 
         # Convert to WAV if necessary.
         input_file = utils.get_input_path_obj(infile_str)
         if input_file.suffix != '.wav':
             input_file = utils.convert_to_wav(input_file)
 
+        # Answer time range queries from the saved index without reanalyzing.
+        if 'query' in options:
+            startsec, endsec = [utils.get_seconds_from_timestamp(t) for t in options['query'].split(',')]
+            summary = index.get_range_summary(index.load_index(input_file), startsec, endsec)
+            if 'longer-than' in options:
+                min_duration = float(options['longer-than'])
+                for prop, intervals in summary.items():
+                    if prop != 'times':
+                        summary[prop] = index.get_intervals_longer_than(intervals, min_duration)
+            outputs.print_range_summary(summary)
+            exit()
+
         # Retrieve file data.
         file_info, byte_frames = utils.get_wav_info(input_file)
 
     startfr = None
     startsec = 0
     endfr = None
-    endsec = None
-    if len(sys.argv) > 2:
-        endsec = float(sys.argv[-1])
+    endsec = float('inf')
+    if len(args) > 2:
+        endsec = float(args[-1])
         endfr = int(endsec * file_info.framerate) # * file_info.sampwidth)
-    if len(sys.argv) == 4:
-        startsec = float(sys.argv[2])
+    if len(args) == 4:
+        startsec = float(args[2])
         startfr = int(startsec * file_info.framerate) # * file_info.sampwidth)
 
     # Convert byte_frames to np_frames, crop according to start and end args.
     np_frames = utils.convert_to_np_frames(byte_frames)
 
+    # Whole-file runs keep the sidecar index up to date for later time range
+    #   queries; cropped runs don't, so that they don't replace the full index.
+    #   If the index covers the start of this audio, only the time frames of
+    #   audio appended since then are analyzed, against the levels of the
+    #   recording stored with the index. Otherwise the index is rebuilt.
+    index_status = None
+    levels = {}
+    first_new = 0
+    if len(args) <= 2:
+        index_status = index.get_index_status(input_file, np_frames, file_info.framerate, analyzers.NFFT)
+        if index_status == 'appended':
+            stored_index = index.load_index(input_file)
+            first_new = len(stored_index['times'])
+            levels = index.get_levels(stored_index['analysis'])
+            if first_new == analyzers.get_frame_ct(len(np_frames)):
+                # Not enough audio was appended to fill another time frame.
+                index_status = 'current'
+                first_new = 0
+                levels = {}
+            else:
+                print(f"Note: analyzing audio appended after {round(stored_index['times'][-1], 3)} s.")
+
     # Generate illustrative plots; return spectrum.
     #np_spectrum, np_freqs, np_times = outputs.generate_plots(input_file, np_frames, file_info.framerate)
-    np_spectrum, np_freqs, np_times, img = analyzers.get_spectrogram_data(file_info.framerate, np_frames)
+    #np_spectrum, np_freqs, np_times, img = analyzers.get_spectrogram_data(file_info.framerate, np_frames)
+    # Skip spectrogram calculation for clearly silent time frames.
+    rms, zcr = analyzers.get_frame_energies(np_frames)
+    if not levels:
+        levels = analyzers.get_prepass_thresholds(rms)
+    active = analyzers.get_active_frames(rms, zcr, levels)
+    active[:first_new] = False
+    workers = int(options['workers']) if 'workers' in options else None
+    np_spectrum, np_freqs, np_times = analyzers.get_parallel_spectrogram_data(file_info.framerate, np_frames, workers, active)
+    outputs.print_sample_properties(analyzers.get_prepass_properties(active))
+    if first_new:
+        startsec = np_times[first_new]
     # Normalize specturm by applying filters.
     np_spectrum, np_freqs = filters.normalize_spectrum(np_spectrum, np_freqs, np_times)
+    if 'max_amp' not in levels:
+        levels['max_amp'] = np_spectrum.max()
+    # Track formants with linear prediction, if selected.
+    formant_tracks = None
+    if options.get('formants', analyzers.FORMANT_ENGINE) == 'lpc':
+        formant_tracks = lpc.get_lpc_formant_tracks(np_frames, file_info.framerate, np_times, active)
     # Organize time frame data into dictionary.
-    time_frames = analyzers.get_time_frames(np_spectrum, np_freqs, np_times, startsec, endsec)
+    time_frames = analyzers.get_time_frames(np_spectrum, np_freqs, np_times, startsec, endsec, active, formant_tracks, levels['max_amp'])
 
-    #outputs.print_sample_properties(analyzers.get_sample_properties(time_frames))
+    f0_track = pitch.get_f0_track(np_frames, file_info.framerate, np_times, active)
+    sample_properties = analyzers.get_sample_properties(time_frames, f0_track)
+    outputs.print_sample_properties(sample_properties)
+    # Find the stretches of sound between silences.
+    segment_table = segments.get_segments(segments.get_frame_arrays(time_frames))
+    # Identify vowels of voiced frames and segments from their LPC formants,
+    #   using the reference formants of the speaker's register.
+    register = options.get('register', sample_properties.get('register', {}).get('value'))
+    if register:
+        vowel_table = vowels.load_vowel_table(options.get('vowels'))
+        if register not in vowel_table:
+            print(f"Error: no reference vowels for register: {register}")
+            exit(1)
+        vowel_index = vowels.get_vowel_index(vowel_table, register)
+        if formant_tracks is None:
+            formant_tracks = lpc.get_lpc_formant_tracks(np_frames, file_info.framerate, np_times, active)
+        voiced_formants = analyzers.get_voiced_formants(formant_tracks, f0_track)
+        time_frames = analyzers.get_vowels(time_frames, vowel_index, voiced_formants)
+        segment_vowels, segment_distances = vowels.classify_segments(vowel_index, segment_table, voiced_formants)
+        outputs.print_segment_vowels(segment_table, segment_vowels, segment_distances)
     #outputs.print_terminal_spectrogram(np_spectrum, np_freqs, np_times, time_frames)
     analyzers.get_phonemes(time_frames)
+    # Save sidecar index for later time range queries.
+    if index_status is None:
+        print("Note: index not saved for cropped time range.")
+    elif index_status == 'appended':
+        index.append_to_index(input_file, time_frames, segment_table, index.get_analysis(np_frames, file_info.framerate, levels))
+    elif index_status == 'stale':
+        index.save_index(index.build_index(time_frames, segment_table, index.get_analysis(np_frames, file_info.framerate, levels)), input_file)
     #outputs.print_frequencies(np_freqs)
     #outputs.print_amplitudes(time_frames)
     print()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Time analysis functions on synthetic audio."""
+
+import contextlib
+import io
+import numpy as np
+import os
+import sys
+import time
+
+from scipy import signal
+
+from speech2ipa import analyzers, filters, lpc
+
+
+def generate_noise(sample_rate, duration):
+    """Return int16 white noise of the given duration."""
+    rng = np.random.default_rng(0)
+    return rng.normal(0, 3000, int(sample_rate * duration)).astype('int16')
+
+def generate_vowel(formants, sample_rate, duration, f0=120, bandwidth=100):
+    """Return an int16 vowel: a glottal pulse train through formant resonators."""
+    pulses = np.zeros(int(sample_rate * duration))
+    pulses[::int(sample_rate / f0)] = 1
+    # Real glottal pulses fall off by about 12 dB per octave.
+    wave = signal.lfilter([1], [1, -0.97], signal.lfilter([1], [1, -0.97], pulses))
+    for f in formants:
+        # Two-pole resonator at frequency f.
+        r = np.exp(-np.pi * bandwidth / sample_rate)
+        theta = 2 * np.pi * f / sample_rate
+        wave = signal.lfilter([1 - r], [1, -2 * r * np.cos(theta), r ** 2], wave)
+    return np.int16(wave / np.abs(wave).max() * 20000)
+
+def get_worker_counts():
+    """Return powers of 2 up to the number of CPUs, plus the number of CPUs."""
+    cpu_ct = os.cpu_count() or 1
+    counts = [2 ** p for p in range(cpu_ct.bit_length()) if 2 ** p <= cpu_ct]
+    if counts[-1] != cpu_ct:
+        counts.append(cpu_ct)
+    return counts
+
+def get_best_time(func, *args, repeat=3, **kwargs):
+    """Return the shortest run time of func in seconds."""
+    times = []
+    for r in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def benchmark_stft(duration):
+    """Print spectrogram speedup for each worker count."""
+    sample_rate = 44100
+    np_frames = generate_noise(sample_rate, duration)
+    print(f"STFT of {duration} s of audio at {sample_rate} Hz")
+    print(f"Workers\tTime [s]\tSpeedup")
+    serial = get_best_time(analyzers.get_parallel_spectrogram_data, sample_rate, np_frames, workers=1)
+    for workers in get_worker_counts():
+        t = get_best_time(analyzers.get_parallel_spectrogram_data, sample_rate, np_frames, workers=workers)
+        print(f"{workers}\t{round(t, 3)}\t\t{round(serial / t, 2)}")
+
+def get_peak_formant_tracks(np_spectrum, np_freqs, np_times):
+    """Return the first two formants of each frame found by spectrum peaks."""
+    max_amp = max(np_spectrum.flat)
+    tracks = np.full((len(np_times), 2), np.nan)
+    # get_formants prints its intermediate values.
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(len(np_times)):
+            time_frame = analyzers.get_amplitudes({'index': i}, np_spectrum, max_amp)
+            formants = analyzers.get_formants(time_frame, np_freqs)['formants'][:2]
+            tracks[i, :len(formants)] = formants
+    return tracks
+
+def benchmark_formants(duration):
+    """Print speed and F1/F2 error of each formant engine on synthetic vowels."""
+    sample_rate = 44100
+    # Formants of /i/, /a/, and /u/ (see Notes.md).
+    vowels = {'i': (300, 2500, 3010), 'a': (800, 1000, 2500), 'u': (300, 900, 2500)}
+    print(f"Formants of {duration} s of each vowel at {sample_rate} Hz")
+    print(f"Vowel\tEngine\tTime [s]\tF1 error [Hz]\tF2 error [Hz]\tFound [%]")
+    for vowel, formants in vowels.items():
+        np_frames = generate_vowel(formants, sample_rate, duration)
+        np_spectrum, np_freqs, np_times = analyzers.get_parallel_spectrogram_data(sample_rate, np_frames)
+        np_spectrum, np_freqs = filters.normalize_spectrum(np_spectrum, np_freqs, np_times)
+        engines = {
+            'peaks': lambda: get_peak_formant_tracks(np_spectrum, np_freqs, np_times),
+            'lpc': lambda: lpc.get_lpc_formant_tracks(np_frames, sample_rate, np_times)[0][:, :2],
+        }
+        for engine, get_tracks in engines.items():
+            start = time.perf_counter()
+            tracks = get_tracks()
+            t = time.perf_counter() - start
+            errors = np.abs(tracks - formants[:2])
+            found = ~np.isnan(tracks).any(axis=1)
+            f1_error, f2_error = np.median(errors[found], axis=0).round() if found.any() else ('-', '-')
+            print(f"{vowel}\t{engine}\t{round(t, 3)}\t\t{f1_error}\t\t{f2_error}\t\t{round(100 * found.mean())}")
+
+
+if __name__ == '__main__':
+    benchmarks = {
+        'stft': benchmark_stft,
+        'formants': benchmark_formants,
+    }
+    if len(sys.argv) == 1 or sys.argv[1] not in benchmarks:
+        print(f"{__file__} {'|'.join(benchmarks)} [duration]")
+        exit(1)
+
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 600
+    benchmarks[sys.argv[1]](duration)
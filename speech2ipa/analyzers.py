@@ -1,10 +1,13 @@
 """Functions that analyze the audio data."""
 
 import numpy as np
+import os
 
+from concurrent.futures import ThreadPoolExecutor
 from matplotlib import pyplot as plt
+from scipy import fft
 
-from speech2ipa import utils
+from speech2ipa import pitch, utils, vowels
 
 
 # Read arguments; set global variables.
@@ -20,6 +23,36 @@ TURB_AMPS_DEV_MIN = 3000        # arbitrary; to distinguish turbulence from voca
 TURB_PEAKS_DEV_MIN = 4000       # arbitrary; to distinguish turbulence from vocalization (redundant)
 VOICE_PEAK_AMP_RANGE_MIN = 7500     # arbitrary; 2000 seems a little overbroad
 
+# If NFFT is too high, then there the horizontal (frequency) resolution is
+#   too fine, and there are multiple bands for each formant. However, if
+#   NFFT is too low, then the whole image is rather blurry and even the
+#   formants are not well differentiated (i.e. at the default vaules for NFFT
+#   and noverlap). noverlap that is half of NFFT seems to minimize background
+#   noise, as well.
+NOVERLAP = 128          # default: 128; other: 256
+NFFT = 256              # default: 256; other: 512
+
+# Note: The energy pre-pass only marks time frames as silent when they are
+#   clearly so, i.e. much quieter than the loudest frame in the recording.
+#   Quiet frames with a high zero-crossing rate are kept because weak
+#   fricatives (e.g. [f], [θ]) look like that, but only if they are also louder
+#   than the background noise, which has a high zero-crossing rate too.
+PREPASS_RMS_RATIO = 0.01        # arbitrary; -40 dB relative to loudest frame
+PREPASS_FRIC_FLOOR_RATIO = 2    # arbitrary; +6 dB relative to background noise
+PREPASS_FRIC_ZCR_MIN = 0.3      # arbitrary; zero crossings per sample
+PREPASS_NOISE_PERCENTILE = 10   # quietest frames are taken as background noise
+PREPASS_HANGOVER = 4            # time frames kept active around each active frame
+
+# The parallel spectrogram splits the time frames into chunks of this many
+#   frames (~6 s at 44.1 kHz); each one is computed in its own thread.
+STFT_WORKERS = os.cpu_count() or 1
+STFT_CHUNK_FRAMES = 2048
+
+# Formants are found either by picking peaks in the spectrum ('peaks') or by
+#   linear prediction ('lpc'; see lpc.py), which isn't limited to the
+#   spectrum's frequency bins.
+FORMANT_ENGINE = 'peaks'
+
 
 def get_spectrogram_data(frame_rate, np_frames):
     """Convert audio frames to spectrogram data array."""
@@ -36,37 +69,141 @@ def get_spectrogram_data(frame_rate, np_frames):
     plt.xlabel('Time (seconds)')
     plt.ylabel('Frequency (Hz)')
 
-    # If NFFT is too high, then there the horizontal (frequency) resolution is
-    #   too fine, and there are multiple bands for each formant. However, if
-    #   NFFT is too low, then the whole image is rather blurry and even the
-    #   formants are not well differentiated (i.e. at the default vaules for NFFT
-    #   and noverlap). noverlap that is half of NFFT seems to minimize background
-    #   noise, as well.
-    noverlap = 128          # default: 128; other: 256
-    NFFT = 256              # default: 256; other: 512
-
     # Create the plot.
     spectrum, frequencies, times, img = plt.specgram(
         np_frames,
         Fs=frame_rate,
         cmap='gnuplot',
-        noverlap=noverlap,
+        noverlap=NOVERLAP,
         NFFT=NFFT,
     )
     return spectrum, frequencies, times, img
 
+def get_frame_energies(np_frames):
+    """Return the RMS and zero-crossing rate of each spectrogram time frame."""
+    # Each time frame covers the same NFFT samples that the spectrogram uses,
+    #   so the result lines up with its columns. The samples are first reduced
+    #   to hop-sized blocks, then adjacent blocks are summed for each frame.
+    hop = NFFT - NOVERLAP
+    if NFFT % hop != 0:
+        raise ValueError(f"NFFT ({NFFT}) must be a multiple of NFFT - noverlap ({hop}).")
+    blocks_per_frame = NFFT // hop
+    np_frames = get_padded_frames(np_frames)
+    frame_ct = get_frame_ct(len(np_frames))
+    block_energies, block_crossings = utils.get_block_stats(np_frames, hop)
+    # Sum blocks in each frame's window with a cumulative sum.
+    energy_cumsum = np.concatenate(([0], np.cumsum(block_energies)))
+    crossings_cumsum = np.concatenate(([0], np.cumsum(block_crossings)))
+    starts = np.arange(frame_ct)
+    ends = starts + blocks_per_frame
+    rms = np.sqrt((energy_cumsum[ends] - energy_cumsum[starts]) / NFFT)
+    zcr = (crossings_cumsum[ends] - crossings_cumsum[starts]) / NFFT
+    return rms, zcr
+
+def get_prepass_thresholds(rms):
+    """Return the loudest and the background noise RMS of the recording."""
+    return {'max_rms': rms.max(), 'noise_rms': np.percentile(rms, PREPASS_NOISE_PERCENTILE)}
+
+def get_active_frames(rms, zcr, thresholds, hangover=PREPASS_HANGOVER):
+    """Find the spectrogram time frames that are not clearly silent."""
+    quiet = rms <= PREPASS_RMS_RATIO * thresholds['max_rms']
+    fricative = (zcr > PREPASS_FRIC_ZCR_MIN) & (rms > PREPASS_FRIC_FLOOR_RATIO * thresholds['noise_rms'])
+    active = ~quiet | fricative
+    # Pad each active run with hangover frames on both sides.
+    if hangover > 0:
+        runs = utils.get_true_runs(active)
+        runs[:, 0] = np.maximum(runs[:, 0] - hangover, 0)
+        runs[:, 1] = np.minimum(runs[:, 1] + hangover, len(active))
+        active = utils.get_runs_mask(runs, len(active))
+    return active
+
+def get_frame_ct(sample_ct):
+    """Return the number of spectrogram time frames in the given number of samples."""
+    # Audio shorter than NFFT fills one time frame (see get_padded_frames).
+    return (max(sample_ct, NFFT) - NOVERLAP) // (NFFT - NOVERLAP)
+
+def get_padded_frames(np_frames):
+    """Pad audio shorter than NFFT with zeros so it fills one time frame."""
+    # This is what plt.specgram does, too.
+    if len(np_frames) < NFFT:
+        np_frames = np.concatenate((np_frames, np.zeros(NFFT - len(np_frames), dtype=np_frames.dtype)))
+    return np_frames
+
+def get_parallel_spectrogram_data(frame_rate, np_frames, workers=None, active=None):
+    """Compute the spectrogram on a thread pool; skip inactive frames if given."""
+    # Gives the same PSD values as plt.specgram. SciPy's FFT releases the GIL,
+    #   so chunks are computed concurrently, and each one is written
+    #   directly into its columns of the preallocated spectrum.
+    if workers is None:
+        workers = STFT_WORKERS
+    hop = NFFT - NOVERLAP
+    np_frames = get_padded_frames(np_frames)
+    frame_ct = get_frame_ct(len(np_frames))
+    if active is None:
+        active = np.ones(frame_ct, dtype='bool')
+    frequencies = fft.rfftfreq(NFFT, 1 / frame_rate)
+    times = (NFFT / 2 + np.arange(frame_ct) * hop) / frame_rate
+    spectrum = np.zeros((len(frequencies), frame_ct))
+    chunks = utils.get_active_chunks(active, STFT_CHUNK_FRAMES)
+
+    window = np.hanning(NFFT)
+    def compute_chunk(chunk):
+        get_spectrum_columns(np_frames, frame_rate, window, chunk.start, chunk.stop, spectrum)
+
+    if workers > 1 and len(chunks) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # list() so that any exception from a thread is raised here.
+            list(executor.map(compute_chunk, chunks))
+    else:
+        for chunk in chunks:
+            compute_chunk(chunk)
+    return spectrum, frequencies, times
+
+def get_spectrum_columns(np_frames, frame_rate, window, start, end, spectrum):
+    """Write the PSD of time frames start to end into the given spectrum."""
+    # Consecutive chunks overlap by noverlap samples, just like the frames.
+    #   The only temporary arrays are the windowed frames and the FFT output;
+    #   the PSD is computed in place in the windowed frames' memory (no longer
+    #   needed after the FFT) and then copied into the spectrum.
+    hop = NFFT - NOVERLAP
+    samples = np_frames[start * hop:(end - 1) * hop + NFFT]
+    frames = np.lib.stride_tricks.sliding_window_view(samples, NFFT)[::hop]
+    windowed = np.multiply(frames, window, out=np.empty(frames.shape))
+    spectra = fft.rfft(windowed, axis=1)
+    psd = windowed.reshape(-1)[:spectra.size].reshape(spectra.shape)
+    np.abs(spectra, out=psd)
+    np.square(psd, out=psd)
+    # Scale like matplotlib's one-sided PSD: double all but the 0 Hz and
+    #   Nyquist bins, then divide by the sampling rate and window power.
+    psd[:, 1:-1] *= 2
+    psd /= frame_rate * (window ** 2).sum()
+    spectrum[:, start:end] = psd.T
+
+def get_prepass_properties(active):
+    """Summarize how much spectrogram work the energy pre-pass skipped."""
+    props = {}
+    props['frames skipped'] = {'value': int(np.count_nonzero(~active)), 'unit': f"of {len(active)}"}
+    skipped_pct = 100 * (1 - np.count_nonzero(active) / len(active)) if len(active) else 0
+    props['compute skipped'] = {'value': round(float(skipped_pct), 1), 'unit': '%'}
+    return props
+
 # ------------------------------------------------------------------------------
 # Analyze data related to each time frame in the audio track.
 # ------------------------------------------------------------------------------
-def get_time_frames(np_spectrum, np_freqs, np_times, startsec, endsec):
+def get_time_frames(np_spectrum, np_freqs, np_times, startsec, endsec, active=None, formant_tracks=None, max_amp=None):
     # Organize data into dictionary.
     time_frames = {}
-    max_amp = max(np_spectrum.flat)
+    if max_amp is None:
+        max_amp = max(np_spectrum.flat)
     for i, t in enumerate(np_times):
         if startsec <= t <= endsec:
             time_frames[t] = {'index': i}
     #time_frames = {t: {'index': i} for i, t in enumerate(np_times)}
     for t, time_frame in time_frames.items():
+        if active is not None and not active[time_frame['index']]:
+            # Skipped by the energy pre-pass.
+            time_frames[t] = get_skipped_frame(time_frame)
+            continue
         # Add amplitudes to dictionary.
         time_frame = get_amplitudes(time_frame, np_spectrum, max_amp)
         # Add silence status to dictionary.
@@ -76,11 +213,23 @@ def get_time_frames(np_spectrum, np_freqs, np_times, startsec, endsec):
         # Add turbulence status.
         time_frame = get_turbulence_status(time_frame, np_freqs)
         # Find formants.
-        time_frame = get_formants(time_frame, np_freqs)
+        if formant_tracks is not None:
+            time_frame = get_lpc_formants(time_frame, formant_tracks)
+        else:
+            time_frame = get_formants(time_frame, np_freqs)
         # Add accumulated data to dictionary.
         time_frames[t] = time_frame
     return time_frames
 
+def get_skipped_frame(time_frame):
+    """Mark the given time frame as silent without analyzing it."""
+    time_frame['amplitudes'] = []
+    time_frame['silence'] = True
+    time_frame['vocalization'] = False
+    time_frame['turbulence'] = False
+    time_frame['formants'] = []
+    return time_frame
+
 def get_amplitudes(time_frame, np_spectrum, max_amp):
     """Add the amplitude at each frequency to the given time frame."""
     # Since these values are inconsistent, they are normalized to a max of 1,000,000.
@@ -161,9 +310,39 @@ def get_formants(time_frame, np_freqs):
             time_frame['formants'].append(round(freq))
     return time_frame
 
-def get_sample_properties(time_frames):
+def get_lpc_formants(time_frame, formant_tracks):
+    """Add the LPC formant frequencies and bandwidths of the given time frame."""
+    formants, bandwidths = formant_tracks
+    found = ~np.isnan(formants[time_frame['index']])
+    time_frame['formants'] = [round(f) for f in formants[time_frame['index']][found]]
+    time_frame['bandwidths'] = [round(b) for b in bandwidths[time_frame['index']][found]]
+    return time_frame
+
+def get_voiced_formants(formant_tracks, f0_track):
+    """Return the LPC formants of voiced time frames; other rows are NaN."""
+    return np.where(np.isnan(f0_track[0])[:, None], np.nan, formant_tracks[0])
+
+def get_vowels(time_frames, vowel_index, formants):
+    """Add the nearest reference vowel of each time frame with formants."""
+    # All time frames are classified in one query; those without formants get ''.
+    vowel_symbols, distances = vowels.classify_vowels(vowel_index, formants)
+    for time_frame in time_frames.values():
+        time_frame['vowel'] = vowel_symbols[time_frame['index']]
+        time_frame['vowel_distance'] = distances[time_frame['index']]
+    return time_frames
+
+def get_sample_properties(time_frames, f0_track=None):
     props = {}
-    props['duration'] = {'value': round(max(time_frames.keys()), 3), 'unit': 's'}
+    props['duration'] = {'value': round(max(time_frames.keys(), default=0), 3), 'unit': 's'}
+    median_f0 = None
+    if f0_track is not None:
+        # Only the given time frames count, e.g. those of a cropped run.
+        indexes = [tf['index'] for tf in time_frames.values()]
+        median_f0 = pitch.get_median_f0([track[indexes] for track in f0_track])
+    if median_f0 is not None:
+        props['F0'] = {'value': round(float(median_f0)), 'unit': 'Hz'}
+        register, speaker = pitch.get_register(median_f0)
+        props['register'] = {'value': register, 'unit': f"({speaker})"}
     return props
 
 # ------------------------------------------------------------------------------
@@ -221,87 +400,3 @@ def is_changed(property, time_frames, t):
 
 def formants_is_changed(time_frames, t):
     pass
-
-# ------------------------------------------------------------------------------
-# Analyze data to describe or identify each phoneme in the audio track.
-# ------------------------------------------------------------------------------
-def get_phoneme_starts(phonemes, time_frames):
-    """Note time frames where sound begins after silence."""
-    # TODO: Consider that not all phonemes are separated by silence.
-    # Separators:
-    #   - silence
-    #   - abrupt change in formants
-    start = 0
-    end = 1
-    phoneme_ct = 0
-    faux_silence_max = 0.005 # seconds;
-    # Dict of time frame indexes and corresponding times.
-    times = {tf['index']: t for t, tf in time_frames.items()}
-    tot_frames = len(times)
-    for t, time_frame in time_frames.items():
-        t = round(t, 4)
-        i = time_frame['index']
-        # Check if phoneme has already begun and if current time frame has silence.
-        if time_frame['silence']:
-            if i == 0:
-                print(i, t, "silence has just started")
-                silence_start = 0
-                continue
-            if not time_frames[times[i-1]]['silence']:
-                print(i, t, "silence started; ", end='')
-                silence_start = t
-                if time_frames.get(times[i+1]) and not time_frames[times[i+1]]['silence']:
-                    # This frame is a one-off.
-                    print("single frame of silence; ignoring")
-                    continue
-            silence_dur = round(t - silence_start, 4)
-            if start:
-                if silence_dur > faux_silence_max:
-                    # TODO: if start is too close to previous end, then assume it is
-                    #   actually the same phoneme.
-                    # End time was earlier time frame's time.
-                    silence_start = round(t - silence_dur, 4)
-                    end = round(t - silence_dur, 4)
-                    # Skip single frame of sound.
-                    #print(start, end)
-                    if start == end:
-                        print(i, start, "single frame of sound; resetting start time")
-                        start = 0
-                        #phoneme_ct -= 1
-                        continue
-                    print("(", end, "end phoneme )")
-                    print(i, t, "silence between phonemes")
-                    phoneme_ct += 1
-                    phonemes[phoneme_ct] = {'start': start}
-                    phonemes[phoneme_ct]['end'] = end
-                    start = 0
-                else:
-                    print(i, "not enough silence: ", silence_dur)
-            elif t == times[len(times) - 1]:
-                print(i, t, "silence in last frame")
-            else:
-                print(i) # silence between phonemes
-        elif not time_frame['silence']:
-            # - First frame handling.
-            if i == 0:
-                if not start:
-                    start = t
-                    print(i, t, 'start phoneme')
-            elif time_frames[times[i-1]]['silence']:
-                if end and not start:
-                    start = t
-                    print(i, t, 'start phoneme')
-                else:
-                    print(i, t, "start:", start, "end:", end)
-            # - Last frame handling.
-            elif t == round(times[len(times) - 1], 4):
-                print(i, t, 'end phoneme')
-                end = t
-                phoneme_ct += 1
-                phonemes[phoneme_ct] = {'start': start}
-                phonemes[phoneme_ct]['end'] = end
-                start = 0
-            else:
-                print(i, '-') # ongoing phoneme
-
-    return phonemes
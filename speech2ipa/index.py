@@ -0,0 +1,195 @@
+"""Functions that build and query a persistent index of analyzed time frames."""
+
+import io
+import numpy as np
+import zlib
+
+from pathlib import Path
+
+from speech2ipa import utils
+
+
+# Time frame properties that are stored as run-length encoded intervals.
+INDEX_PROPERTIES = ('silence', 'vocalization', 'turbulence')
+
+# What audio the index covers, i.e. its length and a checksum of its samples,
+#   and the levels of the whole recording that its time frames were compared
+#   against (see analyzers.get_prepass_thresholds and get_time_frames). Audio
+#   appended later is compared against the same levels.
+ANALYSIS_DTYPE = np.dtype([
+    ('sample_ct', 'int64'),
+    ('frame_rate', 'int64'),
+    ('checksum', 'int64'),
+    ('max_rms', 'float64'),
+    ('noise_rms', 'float64'),
+    ('max_amp', 'float64'),
+])
+LEVEL_NAMES = ('max_rms', 'noise_rms', 'max_amp')
+
+
+# ------------------------------------------------------------------------------
+# Build and store the index.
+# ------------------------------------------------------------------------------
+def get_index_dir(input_file):
+    """Return the sidecar index directory for the given audio file."""
+    return Path(input_file).with_suffix('.index')
+
+def build_index(time_frames, segment_table, analysis):
+    """Convert the time frames dictionary into sorted numeric arrays."""
+    times = np.array(sorted(time_frames.keys()), dtype='float64')
+    index = {'times': times}
+    for prop in INDEX_PROPERTIES:
+        flags = np.array([time_frames[t][prop] for t in times], dtype='bool')
+        index[prop] = get_flag_intervals(flags, times)
+    index['segments'] = np.column_stack((segment_table['start'], segment_table['end']))
+    index['analysis'] = analysis
+    return index
+
+def get_analysis(np_frames, frame_rate, levels):
+    """Record what audio was analyzed and the levels it was compared against."""
+    analysis = np.zeros(1, dtype=ANALYSIS_DTYPE)
+    analysis['sample_ct'] = len(np_frames)
+    analysis['frame_rate'] = frame_rate
+    analysis['checksum'] = zlib.crc32(np_frames)
+    for name in LEVEL_NAMES:
+        analysis[name] = levels[name]
+    return analysis
+
+def get_levels(analysis):
+    """Return the levels that the indexed time frames were compared against."""
+    return {name: analysis[0][name] for name in LEVEL_NAMES}
+
+def get_flag_intervals(flags, times):
+    """Run-length encode boolean flags as [start, end] time intervals."""
+    # Like segments, each interval ends at the time of the first frame after
+    #   the run, or one hop after the last frame if the run is at the end.
+    runs = utils.get_true_runs(flags)
+    hop = times[-1] - times[-2] if len(times) > 1 else 0
+    times_after = np.append(times, times[-1] + hop) if len(times) else times
+    return np.column_stack((times[runs[:, 0]], times_after[runs[:, 1]])).reshape(-1, 2)
+
+def save_index(index, input_file):
+    """Write each index array to its own .npy file in the sidecar directory."""
+    index_dir = get_index_dir(input_file)
+    index_dir.mkdir(exist_ok=True)
+    for name, array in index.items():
+        np.save(index_dir / f"{name}.npy", array)
+    return index_dir
+
+def load_index(input_file):
+    """Memory-map the index arrays; data is only read from disk when accessed."""
+    index_dir = get_index_dir(input_file)
+    if not index_dir.is_dir():
+        print(f"Error: no index found for {input_file}")
+        exit(1)
+    index = {}
+    for npy_file in index_dir.glob('*.npy'):
+        index[npy_file.stem] = np.load(npy_file, mmap_mode='r')
+    return index
+
+def get_index_status(input_file, np_frames, frame_rate, frame_size):
+    """Compare the stored index with the given audio: 'current', 'appended', or 'stale'."""
+    # An index is stale if it's missing or has no analysis record, if its
+    #   audio isn't the start of the given audio (e.g. the file was replaced or
+    #   shortened), or if its audio was shorter than one time frame and so
+    #   padded with zeros.
+    analysis_file = get_index_dir(input_file) / 'analysis.npy'
+    if not analysis_file.is_file():
+        return 'stale'
+    analysis = np.load(analysis_file)[0]
+    sample_ct = analysis['sample_ct']
+    if (analysis['frame_rate'] != frame_rate
+            or not frame_size <= sample_ct <= len(np_frames)
+            or zlib.crc32(np_frames[:sample_ct]) != analysis['checksum']):
+        return 'stale'
+    return 'current' if sample_ct == len(np_frames) else 'appended'
+
+def append_to_index(input_file, time_frames, segment_table, analysis):
+    """Add time frames from newly appended audio to an existing index."""
+    # Only frames later than the last indexed frame are encoded, and their
+    #   rows are appended to the end of each .npy file; the stored data is not
+    #   read or rewritten. An interval or segment that is still open at the end
+    #   of the stored index is extended in place rather than duplicated.
+    index_dir = get_index_dir(input_file)
+    index = load_index(input_file)
+    last_time = index['times'][-1] if len(index['times']) else -np.inf
+    new_frames = {t: tf for t, tf in time_frames.items() if t > last_time}
+    if not new_frames:
+        return index_dir
+    new_index = build_index(new_frames, segment_table, analysis)
+    first_new_time = new_index['times'][0]
+    for name in (*INDEX_PROPERTIES, 'segments'):
+        new = new_index[name]
+        new = new[new[:, 1] > last_time]
+        new = extend_open_interval(index_dir / f"{name}.npy", index[name], new, last_time, first_new_time)
+        append_to_npy(index_dir / f"{name}.npy", new)
+    append_to_npy(index_dir / 'times.npy', new_index['times'])
+    np.save(index_dir / 'analysis.npy', analysis)
+    return index_dir
+
+def extend_open_interval(npy_file, old, new, last_time, first_new_time):
+    """Extend the last stored interval with the first new one if it continues it."""
+    # A stored interval that ends after the last indexed frame ran to the end
+    #   of the stored audio, so a new interval that starts by the first new
+    #   frame continues it. The remaining new intervals are returned.
+    if len(old) and len(new) and old[-1, 1] > last_time and new[0, 0] <= first_new_time:
+        old_rw = np.load(npy_file, mmap_mode='r+')
+        old_rw[-1, 1] = max(old[-1, 1], new[0, 1])
+        old_rw.flush()
+        new = new[1:]
+    return new[new[:, 0] > last_time]
+
+def append_to_npy(npy_file, rows):
+    """Append rows to a .npy file by extending its data and the shape in its header."""
+    # The header is padded with spaces, so the longer shape almost always fits
+    #   in the same number of bytes. If it doesn't, the file is rewritten.
+    if not len(rows):
+        return
+    with open(npy_file, 'r+b') as f:
+        np.lib.format.read_magic(f)
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        header_len = f.tell()
+        new_shape = (shape[0] + len(rows),) + shape[1:]
+        header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(header, {
+            'descr': np.lib.format.dtype_to_descr(dtype),
+            'fortran_order': fortran_order,
+            'shape': new_shape,
+        })
+        if len(header.getvalue()) == header_len:
+            f.seek(0, io.SEEK_END)
+            f.write(np.ascontiguousarray(rows, dtype=dtype).tobytes())
+            f.seek(0)
+            f.write(header.getvalue())
+            return
+    np.save(npy_file, np.concatenate((np.load(npy_file), rows)))
+
+# ------------------------------------------------------------------------------
+# Query the index.
+# ------------------------------------------------------------------------------
+def get_frame_times_in_range(index, startsec, endsec):
+    """Return the frame times that fall between startsec and endsec."""
+    times = index['times']
+    lo = np.searchsorted(times, startsec, side='left')
+    hi = np.searchsorted(times, endsec, side='right')
+    return times[lo:hi]
+
+def get_overlapping_intervals(intervals, startsec, endsec):
+    """Return the [start, end] intervals that overlap the given time range."""
+    # Intervals are sorted and don't overlap each other, so both the start and
+    #   the end columns are sorted and can be binary-searched.
+    lo = np.searchsorted(intervals[:, 1], startsec, side='left')
+    hi = np.searchsorted(intervals[:, 0], endsec, side='right')
+    return intervals[lo:hi]
+
+def get_intervals_longer_than(intervals, min_duration):
+    """Return the [start, end] intervals that last longer than min_duration."""
+    durations = intervals[:, 1] - intervals[:, 0]
+    return intervals[durations > min_duration]
+
+def get_range_summary(index, startsec, endsec):
+    """Collect the frames, flag intervals, and segments in the given time range."""
+    summary = {'times': get_frame_times_in_range(index, startsec, endsec)}
+    for prop in (*INDEX_PROPERTIES, 'segments'):
+        summary[prop] = get_overlapping_intervals(index[prop], startsec, endsec)
+    return summary
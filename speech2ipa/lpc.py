@@ -0,0 +1,98 @@
+"""Functions that track formants with linear prediction (LPC)."""
+
+import numpy as np
+
+from scipy import fft
+
+from speech2ipa import utils
+
+
+# Formants are found below LPC_RATE / 2, so the audio is resampled first. The
+#   LPC order allows 2 coefficients for each of the 5 formants expected below
+#   5.5 kHz, plus 2 for the overall spectral tilt.
+LPC_RATE = 11025                # Hz; Nyquist at 5.5 kHz, cf. Praat's default
+LPC_ORDER = 12
+LPC_WINDOW = 0.025              # seconds; centered on each spectrogram time
+LPC_PRE_EMPHASIS = np.exp(-2 * np.pi * 50 / LPC_RATE)   # boosts frequencies above 50 Hz, as in Praat
+LPC_MIN_FREQ = 90               # Hz; lower roots model the glottal source
+LPC_MAX_BANDWIDTH = 400         # Hz; wider roots are not formants
+LPC_FORMANT_CT = 3              # F1-F3
+LPC_CHUNK_FRAMES = 4096         # frames per batch; bounds the companion matrices
+
+
+def get_lpc_formant_tracks(np_frames, frame_rate, times, active=None):
+    """Return F1-F3 frequencies and bandwidths [Hz] at each of the given times."""
+    # Both arrays have one row per time and LPC_FORMANT_CT columns; missing
+    #   formants and inactive time frames are NaN.
+    formants = np.full((len(times), LPC_FORMANT_CT), np.nan)
+    bandwidths = np.full((len(times), LPC_FORMANT_CT), np.nan)
+    if active is None:
+        active = np.ones(len(times), dtype='bool')
+    for chunk in utils.get_active_chunks(active, LPC_CHUNK_FRAMES):
+        formants[chunk], bandwidths[chunk] = get_chunk_formants(np_frames, frame_rate, times[chunk])
+    return formants, bandwidths
+
+def get_chunk_formants(np_frames, frame_rate, times):
+    """Return F1-F3 frequencies and bandwidths for a contiguous run of times."""
+    frames = get_lpc_frames(np_frames, frame_rate, times)
+    autocorr = get_autocorrelation(frames, LPC_ORDER)
+    coefficients = get_lpc_coefficients(autocorr, LPC_ORDER)
+    roots = get_polynomial_roots(coefficients)
+    return get_formants_from_roots(roots, LPC_RATE)
+
+def get_lpc_frames(np_frames, frame_rate, times):
+    """Return resampled, pre-emphasized, windowed frames centered on times."""
+    frames = utils.get_centered_frames(np_frames, frame_rate, times, LPC_RATE, LPC_WINDOW)
+    frames[:, 1:] = frames[:, 1:] - LPC_PRE_EMPHASIS * frames[:, :-1]
+    return frames * np.hamming(frames.shape[1])
+
+def get_autocorrelation(frames, order):
+    """Return autocorrelation lags 0 to order for each frame, via FFT."""
+    n = fft.next_fast_len(2 * frames.shape[1])
+    power = np.abs(fft.rfft(frames, n=n, axis=1)) ** 2
+    return fft.irfft(power, n=n, axis=1)[:, :order + 1]
+
+def get_lpc_coefficients(autocorr, order):
+    """Solve for LPC coefficients of all frames at once (Levinson-Durbin)."""
+    # Row i holds [1, a1, ..., a_order] of the predictor polynomial
+    #   A(z) = 1 + a1 z^-1 + ... + a_order z^-order.
+    frame_ct = autocorr.shape[0]
+    coefficients = np.zeros((frame_ct, order + 1))
+    coefficients[:, 0] = 1
+    error = autocorr[:, 0].copy()
+    silent = error <= 0
+    error[silent] = 1
+    for i in range(1, order + 1):
+        acc = np.einsum('ij,ij->i', coefficients[:, :i], autocorr[:, i:0:-1])
+        k = -acc / error
+        coefficients[:, 1:i + 1] += k[:, None] * coefficients[:, i - 1::-1]
+        error *= 1 - k ** 2
+    coefficients[silent] = np.nan
+    return coefficients
+
+def get_polynomial_roots(coefficients):
+    """Return the roots of each row's polynomial from its companion matrix."""
+    frame_ct, order = coefficients.shape[0], coefficients.shape[1] - 1
+    companions = np.zeros((frame_ct, order, order))
+    companions[:, 0, :] = -coefficients[:, 1:]
+    companions[:, np.arange(1, order), np.arange(order - 1)] = 1
+    roots = np.full((frame_ct, order), np.nan, dtype='complex128')
+    valid = np.isfinite(coefficients).all(axis=1)
+    roots[valid] = np.linalg.eigvals(companions[valid])
+    return roots
+
+def get_formants_from_roots(roots, rate):
+    """Convert polynomial roots to the lowest formant frequencies and bandwidths."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        freqs = np.angle(roots) * rate / (2 * np.pi)
+        bandwidths = -np.log(np.abs(roots)) * rate / np.pi
+    # Keep one of each conjugate pair, within the expected ranges.
+    is_formant = (freqs > LPC_MIN_FREQ) & (bandwidths < LPC_MAX_BANDWIDTH)
+    freqs = np.where(is_formant, freqs, np.inf)
+    order = np.argsort(freqs, axis=1)[:, :LPC_FORMANT_CT]
+    freqs = np.take_along_axis(freqs, order, axis=1)
+    bandwidths = np.take_along_axis(bandwidths, order, axis=1)
+    missing = ~np.isfinite(freqs)
+    freqs[missing] = np.nan
+    bandwidths[missing] = np.nan
+    return freqs, bandwidths
@@ -149,10 +149,26 @@ def print_sample_properties(properties_dict):
     for prop, data in properties_dict.items():
         print(f"{prop}: {data['value']} {data.get('unit')}")
 
+def print_range_summary(summary):
+    """Print the indexed frames, flag intervals, and segments of a time range."""
+    print(f"Frames: {len(summary['times'])}")
+    for prop, intervals in summary.items():
+        if prop == 'times':
+            continue
+        print(f"{prop}:")
+        for start, end in intervals:
+            print(f"\t{round(start, 3)}\t{round(end, 3)}\t{round(end - start, 3)} s")
+
+def print_segment_vowels(segments, vowels, distances):
+    """Print the nearest reference vowel of each segment."""
+    print(f"Start\tEnd\tVowel\tDistance [Bark]")
+    for segment, vowel, distance in zip(segments, vowels, distances):
+        print(f"{round(segment['start'], 3)}\t{round(segment['end'], 3)}\t{vowel}\t{round(distance, 2)}")
+
 def print_frame_data(time_frames):
-    print(f"Index\tTime\tSilence\tVocal.\tTurb.\tFormants")
+    print(f"Index\tTime\tSilence\tVocal.\tTurb.\tVowel\tFormants")
     for t, data in time_frames.items():
-        print(f"{data['index']}\t{round(t, 3)}\t{data['silence']}\t{data['vocalization']}\t{data['turbulence']}\t{data['formants']}")
+        print(f"{data['index']}\t{round(t, 3)}\t{data['silence']}\t{data['vocalization']}\t{data['turbulence']}\t{data.get('vowel', '')}\t{data['formants']}")
 
 def print_amplitudes(time_frames):
     for t, data in time_frames.items():
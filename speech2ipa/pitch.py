@@ -0,0 +1,118 @@
+"""Functions that track the fundamental frequency (F0) of the voice."""
+
+import numpy as np
+
+from scipy import fft
+
+from speech2ipa import utils
+
+
+# F0 is found with the YIN difference function, which measures how much each
+#   frame differs from itself when shifted by a given lag (period).
+#   See: http://audition.ens.fr/adc/pdf/2002_JASA_YIN.pdf
+F0_RATE = 11025             # Hz; plenty for finding periods of F0 < 600 Hz
+F0_WINDOW = 0.04            # seconds; holds 3 periods of the lowest F0
+F0_MIN = 75                 # Hz; lowest adult male voices
+F0_MAX = 600                # Hz; highest children's voices
+F0_THRESHOLD = 0.15         # YIN's "absolute threshold"; lower is stricter
+F0_CHUNK_FRAMES = 4096      # frames per batch; bounds the difference function arrays
+
+# Median F0 ranges of each register (see Notes.md).
+REGISTER_MEDIUM_MIN = 160   # Hz; adult female
+REGISTER_HIGH_MIN = 260     # Hz; child
+
+
+def get_f0_track(np_frames, frame_rate, times, active=None):
+    """Return the F0 [Hz] and voicing confidence (0-1) at each of the given times."""
+    # F0 is NaN where no period was found or the time frame is inactive.
+    f0 = np.full(len(times), np.nan)
+    confidence = np.zeros(len(times))
+    if active is None:
+        active = np.ones(len(times), dtype='bool')
+    for chunk in utils.get_active_chunks(active, F0_CHUNK_FRAMES):
+        f0[chunk], confidence[chunk] = get_chunk_f0(np_frames, frame_rate, times[chunk])
+    return f0, confidence
+
+def get_chunk_f0(np_frames, frame_rate, times):
+    """Return the F0 and voicing confidence for a contiguous run of times."""
+    frames = utils.get_centered_frames(np_frames, frame_rate, times, F0_RATE, F0_WINDOW)
+    max_lag = int(F0_RATE / F0_MIN) + 1
+    min_lag = int(F0_RATE / F0_MAX)
+    cmnd = get_cumulative_mean_normalized_difference(frames, max_lag)
+    # Take the first dip below the threshold, i.e. the shortest period, so that
+    #   its multiples at longer lags are skipped; if there is none, the frame
+    #   is unvoiced.
+    lags = np.arange(max_lag + 1)
+    is_dip = np.zeros_like(cmnd, dtype='bool')
+    is_dip[:, 1:-1] = (cmnd[:, 1:-1] <= cmnd[:, :-2]) & (cmnd[:, 1:-1] <= cmnd[:, 2:])
+    is_candidate = is_dip & (cmnd < F0_THRESHOLD) & (lags >= min_lag)
+    is_voiced = is_candidate.any(axis=1)
+    best_lags = np.where(
+        is_voiced,
+        np.argmax(is_candidate, axis=1),
+        np.argmin(np.where(lags >= min_lag, cmnd, np.inf), axis=1),
+    )
+    confidence = np.clip(1 - cmnd[np.arange(len(frames)), best_lags], 0, 1)
+    periods = get_interpolated_lags(cmnd, best_lags)
+    f0 = np.where(is_voiced, F0_RATE / periods, np.nan)
+    return f0, confidence
+
+def get_cumulative_mean_normalized_difference(frames, max_lag):
+    """Return YIN's normalized difference function for lags 0 to max_lag."""
+    # d(lag) = sum((x[j] - x[j + lag]) ** 2) over the first half of each frame,
+    #   expanded as energy terms minus twice the cross-correlation. Both are
+    #   computed for all frames and lags at once (the latter via FFT).
+    half = frames.shape[1] - max_lag
+    n = fft.next_fast_len(frames.shape[1] + half)
+    cross = fft.irfft(
+        fft.rfft(frames, n=n, axis=1) * np.conj(fft.rfft(frames[:, :half], n=n, axis=1)),
+        n=n,
+        axis=1,
+    )[:, :max_lag + 1]
+    energy_cumsum = np.concatenate((np.zeros((len(frames), 1)), np.cumsum(frames ** 2, axis=1)), axis=1)
+    lags = np.arange(max_lag + 1)
+    shifted_energy = energy_cumsum[:, lags + half] - energy_cumsum[:, lags]
+    diff = energy_cumsum[:, half:half + 1] + shifted_energy - 2 * cross
+    # Normalize by the running mean so that the function starts at 1 and
+    #   doesn't favor lag 0.
+    diff_cumsum = np.cumsum(diff[:, 1:], axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cmnd = np.ones_like(diff)
+        cmnd[:, 1:] = diff[:, 1:] * lags[1:] / diff_cumsum
+    cmnd[~np.isfinite(cmnd)] = 1
+    return cmnd
+
+def get_interpolated_lags(values, lags):
+    """Refine each row's lag to the vertex of a parabola through its neighbors."""
+    rows = np.arange(len(values))
+    lags = np.clip(lags, 1, values.shape[1] - 2)
+    left, center, right = values[rows, lags - 1], values[rows, lags], values[rows, lags + 1]
+    denominator = left - 2 * center + right
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shift = np.where(denominator > 0, 0.5 * (left - right) / denominator, 0)
+    return lags + np.clip(shift, -0.5, 0.5)
+
+def get_weighted_median(values, weights):
+    """Return the value at which half of the total weight is reached."""
+    order = np.argsort(values)
+    weight_cumsum = np.cumsum(weights[order])
+    return values[order][np.searchsorted(weight_cumsum, weight_cumsum[-1] / 2)]
+
+def get_median_f0(f0_track):
+    """Return the median F0 of voiced frames, weighted by voicing confidence."""
+    # Less clearly voiced frames (e.g. at the edges of a vowel) count for less.
+    f0, confidence = f0_track
+    voiced = ~np.isnan(f0)
+    if not voiced.any():
+        return None
+    return get_weighted_median(f0[voiced], confidence[voiced])
+
+def get_register(median_f0):
+    """Return the register that fits the given median F0."""
+    if median_f0 < REGISTER_MEDIUM_MIN:
+        register = ('low', 'adult male')
+    elif median_f0 < REGISTER_HIGH_MIN:
+        register = ('medium', 'adult female')
+    else:
+        register = ('high', 'child')
+    return register
@@ -0,0 +1,132 @@
+"""Functions that find and edit phoneme segments using numeric arrays."""
+
+import numpy as np
+
+from speech2ipa import utils
+
+
+FAUX_SILENCE_MAX = 0.005    # seconds; shorter silences don't separate phonemes
+
+# One row per segment. start_index and end_index (exclusive) are spectrogram
+#   frame indexes, i.e. time_frame['index']. end is the time of the frame at
+#   end_index, i.e. when the following silence starts, or one hop after the
+#   last frame if the segment runs to the end.
+SEGMENT_DTYPE = np.dtype([
+    ('start_index', 'int64'),
+    ('end_index', 'int64'),
+    ('start', 'float64'),
+    ('end', 'float64'),
+    ('duration', 'float64'),
+    ('vocalization', 'bool'),
+    ('turbulence', 'bool'),
+])
+
+
+def get_frame_arrays(time_frames):
+    """Convert the time frames dictionary into arrays ordered by frame index."""
+    time_frames = sorted(time_frames.items(), key=lambda item: item[1]['index'])
+    frames = {'times': np.array([t for t, tf in time_frames], dtype='float64')}
+    frames['indexes'] = np.array([tf['index'] for t, tf in time_frames], dtype='int64')
+    for prop in ('silence', 'vocalization', 'turbulence'):
+        frames[prop] = np.array([tf[prop] for t, tf in time_frames], dtype='bool')
+    return frames
+
+def get_segments(frames, faux_silence_max=FAUX_SILENCE_MAX):
+    """Find the stretches of sound that are separated by silence.
+
+    Single frames of silence and inner silences up to faux_silence_max long are
+    ignored, and so are single frames of sound:
+
+    >>> flags = np.array([c == 'S' for c in 'SS...S..SS..SSS.SSS'])
+    >>> frames = {
+    ...     'times': (128 + np.arange(100, 119) * 128) / 44100,
+    ...     'indexes': np.arange(100, 119),
+    ...     'silence': flags,
+    ...     'vocalization': ~flags,
+    ...     'turbulence': np.zeros(19, dtype='bool'),
+    ... }
+    >>> get_segments(frames)[['start_index', 'end_index']].tolist()
+    [(102, 112)]
+
+    A sound at the end is kept even if only a short silence follows it:
+
+    >>> frames['silence'] = np.array([c == 'S' for c in 'SS...S..SS..SSS..SS'])
+    >>> get_segments(frames)[['start_index', 'end_index']].tolist()
+    [(102, 112), (115, 117)]
+    """
+    # TODO: Consider that not all phonemes are separated by silence.
+    # Separators:
+    #   - silence
+    #   - abrupt change in formants
+    times = frames['times']
+    silence = frames['silence'].copy()
+    # Ignore single frames of silence and silences that are too short, unless
+    #   they are at the beginning or end of the recording.
+    silence_runs = utils.get_true_runs(silence)
+    lengths = silence_runs[:, 1] - silence_runs[:, 0]
+    durations = times[silence_runs[:, 1] - 1] - times[silence_runs[:, 0]]
+    is_inner = (silence_runs[:, 0] > 0) & (silence_runs[:, 1] < len(silence))
+    faux_silences = silence_runs[is_inner & ((lengths == 1) | (durations <= faux_silence_max))]
+    silence[utils.get_runs_mask(faux_silences, len(silence))] = False
+    # Ignore single frames of sound.
+    sound_runs = utils.get_true_runs(~silence)
+    sound_runs = sound_runs[sound_runs[:, 1] - sound_runs[:, 0] > 1]
+    return get_segment_rows(frames, sound_runs[:, 0], sound_runs[:, 1])
+
+def get_segment_rows(frames, start_positions, end_positions):
+    """Build segment table rows for the given [start, end) positions in frames."""
+    times = frames['times']
+    segments = np.zeros(len(start_positions), dtype=SEGMENT_DTYPE)
+    if not len(segments):
+        return segments
+    segments['start_index'] = frames['indexes'][start_positions]
+    segments['end_index'] = frames['indexes'][end_positions - 1] + 1
+    segments['start'] = times[start_positions]
+    hop = times[-1] - times[-2] if len(times) > 1 else 0
+    times_after = np.append(times, times[-1] + hop)
+    segments['end'] = times_after[end_positions]
+    segments['duration'] = segments['end'] - segments['start']
+    # A flag is dominant if it is set in more than half of the segment's frames.
+    for prop in ('vocalization', 'turbulence'):
+        flag_cumsum = np.concatenate(([0], np.cumsum(frames[prop])))
+        flag_cts = flag_cumsum[end_positions] - flag_cumsum[start_positions]
+        segments[prop] = 2 * flag_cts > end_positions - start_positions
+    return segments
+
+def get_positions(frames, indexes):
+    """Return the positions in frames of the given frame indexes."""
+    return np.searchsorted(frames['indexes'], indexes)
+
+def find_segment(segments, t):
+    """Return the position of the last segment starting at or before time t."""
+    return np.searchsorted(segments['start'], t, side='right') - 1
+
+# Note: Finding the segment to merge or split is O(log n), but the new table
+#   is a copy, so each merge or split is O(n) overall.
+def merge_segments(segments, frames, t):
+    """Merge the segment at time t with the segment that follows it."""
+    i = find_segment(segments, t)
+    if not 0 <= i < len(segments) - 1:
+        raise ValueError(f"No pair of segments to merge at {t} s.")
+    merged = get_segment_rows(
+        frames,
+        get_positions(frames, segments['start_index'][i:i+1]),
+        get_positions(frames, segments['end_index'][i+1:i+2]),
+    )
+    return np.concatenate((segments[:i], merged, segments[i+2:]))
+
+def split_segment(segments, frames, t):
+    """Split the segment at time t so that the second part starts at t."""
+    i = find_segment(segments, t)
+    if i < 0:
+        raise ValueError(f"No segment to split at {t} s.")
+    start_position, end_position = get_positions(frames, [segments['start_index'][i], segments['end_index'][i]])
+    split_position = np.searchsorted(frames['times'], t, side='left')
+    if not start_position < split_position < end_position:
+        raise ValueError(f"No segment to split at {t} s.")
+    split = get_segment_rows(
+        frames,
+        np.array([start_position, split_position]),
+        np.array([split_position, end_position]),
+    )
+    return np.concatenate((segments[:i], split, segments[i+1:]))
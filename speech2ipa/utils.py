@@ -5,7 +5,9 @@ import math
 import numpy as np
 import wave
 
+from fractions import Fraction
 from pathlib import Path
+from scipy import signal
 
 
 def get_input_file_properties(input_file):
@@ -81,11 +83,38 @@ def get_output_file_obj(infile_obj):
     output_file = input_file.with_name(f"{input_file.stem}.wav")
     return output_file
 
+def get_seconds_from_timestamp(timestamp):
+    """Convert a timestamp like "01:12:03.5" to seconds."""
+    seconds = 0
+    for part in str(timestamp).split(':'):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
 def convert_to_np_frames(byte_frames):
     np_frames = np.frombuffer(byte_frames, dtype='int16')
     #np_frames = np_frames[start:end]
     return np_frames
 
+def get_centered_frames(np_frames, frame_rate, times, rate, duration):
+    """Return frames of the given duration [s] centered on times, resampled to rate."""
+    # Only the stretch of audio covering these times is resampled, with a
+    #   margin so that the resampling filter has settled at the frame edges.
+    ratio = Fraction(rate, int(frame_rate)).limit_denominator(1000)
+    frame_len = int(duration * rate)
+    margin = int(duration * frame_rate)
+    first = max(int(times[0] * frame_rate) - margin, 0)
+    last = min(int(times[-1] * frame_rate) + margin, len(np_frames))
+    samples = signal.resample_poly(
+        np.asarray(np_frames[first:last], dtype='float64'),
+        ratio.numerator,
+        ratio.denominator,
+    )
+    # Pad so that frames at the very start and end of the audio fit.
+    samples = np.pad(samples, frame_len)
+    starts = np.round((times - first / frame_rate) * rate).astype('int64') - frame_len // 2 + frame_len
+    windows = np.lib.stride_tricks.sliding_window_view(samples, frame_len)
+    return windows[starts]
+
 def get_list_stats(items):
     items_range = len(items)
     items_sum = np.sum(items)
@@ -93,6 +122,47 @@ def get_list_stats(items):
     items_std_dev = np.std(items)
     return items_range, items_sum, items_avg, items_std_dev
 
+def get_block_stats(np_frames, block_size, blocks_per_chunk=65536):
+    """Return the energy and zero-crossing count of each block of samples."""
+    # Chunks keep the float copy of the samples small for long recordings.
+    block_ct = len(np_frames) // block_size
+    energies = np.empty(block_ct)
+    crossings = np.empty(block_ct)
+    signs = np.signbit(np_frames)
+    for b in range(0, block_ct, blocks_per_chunk):
+        b_end = min(b + blocks_per_chunk, block_ct)
+        chunk = np_frames[b * block_size:b_end * block_size].astype('float64')
+        energies[b:b_end] = np.square(chunk).reshape(-1, block_size).sum(axis=1)
+        # A crossing is counted in the block of the sample after the sign change.
+        lo = max(b * block_size - 1, 0)
+        changes = signs[lo + 1:b_end * block_size] != signs[lo:b_end * block_size - 1]
+        if b == 0:
+            changes = np.concatenate(([False], changes))
+        crossings[b:b_end] = changes.reshape(-1, block_size).sum(axis=1)
+    return energies, crossings
+
+def get_true_runs(flags):
+    """Return [start, end) index pairs of each run of True values."""
+    edges = np.diff(np.concatenate(([0], np.asarray(flags, dtype='int8'), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return np.column_stack((starts, ends))
+
+def get_active_chunks(active, size):
+    """Split each run of active frames into slices of at most size frames."""
+    chunks = []
+    for start, end in get_true_runs(active):
+        for chunk_start in range(start, end, size):
+            chunks.append(slice(chunk_start, min(chunk_start + size, end)))
+    return chunks
+
+def get_runs_mask(runs, length):
+    """Return a boolean array that is True inside each [start, end) run."""
+    edges = np.zeros(length + 1, dtype='int64')
+    np.add.at(edges, runs[:, 0], 1)
+    np.add.at(edges, runs[:, 1], -1)
+    return np.cumsum(edges[:-1]) > 0
+
 def get_min_amp(frequency):
     """Return the minimum usable amplitude for a given frequency."""
     # In human speech, the loudness of the 8000 Hz band is about 18 dB less than the 200 Hz band.
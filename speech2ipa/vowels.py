@@ -0,0 +1,108 @@
+"""Functions that identify vowels from their formant frequencies."""
+
+import csv
+import numpy as np
+
+from scipy.spatial import cKDTree
+
+
+# Average F1, F2, F3 [Hz] of each vowel for each register (see Notes.md).
+#   Values are from Hillenbrand et al. (1995), "Acoustic characteristics of
+#   American English vowels": men (low), women (medium), and children (high).
+VOWEL_FORMANTS = {
+    'low': {
+        'i': (342, 2322, 3000),
+        'ɪ': (427, 2034, 2684),
+        'e': (476, 2089, 2691),
+        'ɛ': (580, 1799, 2605),
+        'æ': (588, 1952, 2601),
+        'ɑ': (768, 1333, 2522),
+        'ɔ': (652, 997, 2538),
+        'o': (497, 910, 2459),
+        'ʊ': (469, 1122, 2434),
+        'u': (378, 997, 2343),
+        'ʌ': (623, 1200, 2550),
+        'ɝ': (474, 1379, 1710),
+    },
+    'medium': {
+        'i': (437, 2761, 3372),
+        'ɪ': (483, 2365, 3053),
+        'e': (536, 2530, 3047),
+        'ɛ': (731, 2058, 2979),
+        'æ': (669, 2349, 2972),
+        'ɑ': (936, 1551, 2815),
+        'ɔ': (781, 1136, 2824),
+        'o': (555, 1035, 2828),
+        'ʊ': (519, 1225, 2827),
+        'u': (459, 1105, 2735),
+        'ʌ': (753, 1426, 2933),
+        'ɝ': (523, 1588, 1929),
+    },
+    'high': {
+        'i': (452, 3081, 3702),
+        'ɪ': (511, 2552, 3403),
+        'e': (564, 2656, 3323),
+        'ɛ': (749, 2267, 3310),
+        'æ': (717, 2501, 3289),
+        'ɑ': (1002, 1688, 2950),
+        'ɔ': (803, 1210, 2982),
+        'o': (597, 1137, 2987),
+        'ʊ': (568, 1490, 3072),
+        'u': (494, 1345, 2988),
+        'ʌ': (749, 1546, 3145),
+        'ɝ': (586, 1719, 2143),
+    },
+}
+VOWEL_FORMANT_CT = 2    # F3 is not needed for distinguishing between vowels
+
+
+def load_vowel_table(table_file=None):
+    """Return the built-in vowel formants, updated from an optional CSV file."""
+    # The CSV file needs the columns: register, ipa, F1, F2, F3. Its rows
+    #   replace built-in vowels of the same register or add new ones; the
+    #   register can also be a new name, e.g. for a particular speaker.
+    table = {register: dict(vowels) for register, vowels in VOWEL_FORMANTS.items()}
+    if table_file:
+        with open(table_file, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                formants = tuple(float(row[k]) for k in ('F1', 'F2', 'F3'))
+                table.setdefault(row['register'], {})[row['ipa']] = formants
+    return table
+
+def hz_to_bark(frequency):
+    """Convert Hz to the Bark scale, where equal steps sound equally far apart."""
+    # See: Traunmüller (1990), "Analytical expressions for the tonotopic sensory scale".
+    return 26.81 * frequency / (1960 + frequency) - 0.53
+
+def get_vowel_index(table, register, formant_ct=VOWEL_FORMANT_CT):
+    """Build a KD-tree of the register's vowels in Bark-scaled formant space."""
+    # Build this once per register and reuse it for every query.
+    symbols = np.array(list(table[register].keys()))
+    formants = np.array(list(table[register].values()))[:, :formant_ct]
+    return cKDTree(hz_to_bark(formants)), symbols
+
+def classify_vowels(vowel_index, formants):
+    """Return the nearest vowel and its distance [Bark] for each row of formants."""
+    # Rows with missing formants (NaN) get an empty symbol and infinite distance.
+    tree, symbols = vowel_index
+    formants = np.asarray(formants)[:, :tree.m]
+    found = ~np.isnan(formants).any(axis=1)
+    vowels = np.full(len(formants), '', dtype=symbols.dtype)
+    distances = np.full(len(formants), np.inf)
+    distances[found], nearest = tree.query(hz_to_bark(formants[found]))
+    vowels[found] = symbols[nearest]
+    return vowels, distances
+
+def classify_segments(vowel_index, segments, formants):
+    """Return the nearest vowel and its distance for each segment's median formants."""
+    # Only the formants that the index compares count, so a frame without F3
+    #   still counts if it has F1 and F2.
+    tree, symbols = vowel_index
+    formants = np.asarray(formants)[:, :tree.m]
+    segment_formants = np.full((len(segments), tree.m), np.nan)
+    for i, segment in enumerate(segments):
+        segment_rows = formants[segment['start_index']:segment['end_index']]
+        found = ~np.isnan(segment_rows).any(axis=1)
+        if found.any():
+            segment_formants[i] = np.median(segment_rows[found], axis=0)
+    return classify_vowels(vowel_index, segment_formants)